@@ -1,7 +1,15 @@
+from .netbox import IndexedInventory
+from .netbox import LoadPlan
 from .netbox import NBInventory
 from .netbox import NetBoxInventory2
+from .netbox import NetBoxSharedInventory
+from .netbox import prefetch_config_context
 
 __all__ = (
+    "IndexedInventory",
+    "LoadPlan",
     "NBInventory",
     "NetBoxInventory2",
+    "NetBoxSharedInventory",
+    "prefetch_config_context",
 )
@@ -1,13 +1,27 @@
 import os
+import hashlib
+import json
+import mmap
+import pickle
+import struct
+import time
 import warnings
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
 from typing import Optional
+from typing import Tuple
 from typing import Union
 from typing import Type
 from pathlib import Path
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
 
 from nornir.core.inventory import ConnectionOptions
 from nornir.core.inventory import Defaults
@@ -22,6 +36,12 @@ from nornir.core.inventory import ParentGroups
 import requests
 import ruamel.yaml
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,6 +90,454 @@ def _get_inventory_element(
     )
 
 
+def _chunked(values: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(values), size):
+        end = start + size
+        yield values[start:end]
+
+
+def _get_parent_id(resource: Dict[str, Any], parent: str) -> Any:
+    """
+    Returns the id of the device or virtual machine a resource belongs to, either
+    directly (interfaces) or through the interface/object it is assigned to (IP addresses)
+    """
+    for owner in (
+        resource,
+        resource.get("assigned_object") or {},  # NetBox >= 2.9
+        resource.get("interface") or {},  # NetBox < 2.9
+    ):
+        if isinstance(owner.get(parent), dict):
+            return owner[parent].get("id")
+    return None
+
+
+# parsed yaml files, pickled, indexed by path, modification time and size
+_yaml_file_cache: Dict[Tuple[str, int, int], bytes] = {}
+
+# header of a file in the yaml file cache directory, modification time and size of the
+# parsed file
+_YAML_CACHE_HEADER = struct.Struct("<qQ")
+
+
+def _load_yaml_file(path: Path, cache_dir: Optional[Path] = None) -> Any:
+    """
+    Returns the parsed content of a yaml file.
+
+    The parsed content is cached in memory, and in ``cache_dir`` if set, until the
+    modification time or size of the file changes. ``cache_dir`` holds a single file
+    per parsed file, which is replaced when the parsed file changes. Every call returns
+    a new copy of the content, so modifications don't leak into the cache.
+    """
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    cached = _yaml_file_cache.get(key)
+    cache_file = None
+
+    header = _YAML_CACHE_HEADER.pack(stat.st_mtime_ns, stat.st_size)
+
+    if cache_dir:
+        cache_file = cache_dir / f"{hashlib.sha1(key[0].encode()).hexdigest()}.pickle"
+
+    if cached is None and cache_file and cache_file.exists():
+        content = cache_file.read_bytes()
+        header_size = len(header)
+        if content[:header_size] == header:
+            cached = content[header_size:]
+
+    if cached is None:
+        # uses the C based parser when ruamel.yaml.clib is available
+        yml = ruamel.yaml.YAML(typ="safe")
+        with path.open("r") as f:
+            cached = pickle.dumps(yml.load(f), pickle.HIGHEST_PROTOCOL)
+
+        if cache_file:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.tmp")
+            tmp_file.write_bytes(header + cached)
+            os.replace(tmp_file, cache_file)
+
+    for stale in [k for k in _yaml_file_cache if k[0] == key[0] and k != key]:
+        del _yaml_file_cache[stale]
+    _yaml_file_cache[key] = cached
+
+    return pickle.loads(cached)
+
+
+_SHARED_INVENTORY_MAGIC = b"NBINV1"
+_SHARED_INVENTORY_HEADER = struct.Struct("<Q")
+
+
+def _get_element_dict(element: Union[Host, Group, Defaults]) -> Dict[str, Any]:
+    d = element.dict()
+    # lazily loaded host data keeps its config context loader
+    if not isinstance(element.data, _LazyConfigContextData):
+        d["data"] = dict(element.data)
+    return d
+
+
+def _write_shared_inventory(inventory: Inventory, path: Path) -> None:
+    """
+    Writes an inventory to a file that can be memory mapped by NetBoxSharedInventory.
+
+    The file contains a header with the defaults, the groups and the offset of each
+    host, followed by the hosts, each serialized separately so they can be decoded
+    individually. The file is replaced atomically, processes that have the previous
+    file mapped keep using it.
+
+    Lazily loaded hosts keep loading their config context on first access, which
+    requires the NetBox API token to be written to the file. In that case the file is
+    only readable by its owner.
+    """
+    blobs: List[bytes] = []
+    offsets: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+
+    for name, host in inventory.hosts.items():
+        blob = pickle.dumps(_get_element_dict(host), pickle.HIGHEST_PROTOCOL)
+        offsets[name] = (offset, len(blob))
+        offset += len(blob)
+        blobs.append(blob)
+
+    header = pickle.dumps(
+        {
+            "defaults": _get_element_dict(inventory.defaults),
+            "groups": {n: _get_element_dict(g) for n, g in inventory.groups.items()},
+            "hosts": offsets,
+        },
+        pickle.HIGHEST_PROTOCOL,
+    )
+
+    lazy = any(
+        isinstance(h.data, _LazyConfigContextData) for h in inventory.hosts.values()
+    )
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    with os.fdopen(os.open(tmp_path, flags, 0o600 if lazy else 0o666), "wb") as f:
+        f.write(_SHARED_INVENTORY_MAGIC)
+        f.write(_SHARED_INVENTORY_HEADER.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+
+def _compile_group_path(name: str, path: str) -> Callable[[Dict[str, Any]], List[str]]:
+    """
+    Returns a function that extracts the groups for the value found at ``path``, a dot
+    separated list of keys, in a device/vm. Lists are traversed, so every element of the
+    list results in a group.
+    """
+    hops = path.split(".")
+    prefix = f"{name}__"
+
+    def extract(device: Dict[str, Any]) -> List[str]:
+        values: List[Any] = [device]
+        for hop in hops:
+            found: List[Any] = []
+            for data in values:
+                if isinstance(data, dict):
+                    v = data.get(hop)
+                    if isinstance(v, list):
+                        found.extend(v)
+                    elif v is not None:
+                        found.append(v)
+            values = found
+        return [
+            f"{prefix}{v}"
+            for v in values
+            if isinstance(v, (str, int, float)) and not isinstance(v, bool)
+        ]
+
+    return extract
+
+
+def _compile_value_path(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Returns a function that extracts the value found at ``path``, a dot separated list
+    of keys, in a device/vm, or None if the path doesn't exist
+    """
+    hops = path.split(".")
+
+    def extract(resource: Dict[str, Any]) -> Any:
+        value: Any = resource
+        for hop in hops:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(hop)
+        return value
+
+    return extract
+
+
+def _get_host_name(device: Dict[str, Any]) -> str:
+    return device.get("name") or str(device.get("id"))
+
+
+def _get_version_key(device: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Returns a key that changes when the device/vm, or the interfaces and IP addresses
+    attached to it, are updated in NetBox. Attached objects without a ``last_updated``
+    timestamp are represented by a hash of their content instead. Returns None when the
+    device/vm itself doesn't have a ``last_updated`` timestamp, so changes can't be
+    detected.
+    """
+    if device.get("last_updated") is None:
+        return None
+
+    key = [(device.get("id"), device.get("last_updated"))]
+    for attribute in ("interfaces", "ip_addresses"):
+        for resource in device.get(attribute) or ():
+            version = resource.get("last_updated")
+            if version is None:
+                version = hash(json.dumps(resource, sort_keys=True, default=str))
+            key.append((resource.get("id"), version))
+    return tuple(key)
+
+
+class _TableBuilder:
+    """
+    Builds a table of devices/vm's, with a ``host`` column and a column for each of
+    ``columns`` (column name mapped to a dot separated path in the device/vm).
+    """
+
+    def __init__(self, columns: Dict[str, str]) -> None:
+        self.extractors: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "host": _get_host_name
+        }
+        self.extractors.update(
+            {name: _compile_value_path(path) for name, path in columns.items()}
+        )
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.extractors}
+
+    def add(self, resources: List[Dict[str, Any]]) -> None:
+        for name, extract in self.extractors.items():
+            self.columns[name].extend(extract(r) for r in resources)
+
+    def build(self) -> "pyarrow.Table":
+        arrays = {}
+        for name, values in self.columns.items():
+            try:
+                arrays[name] = pyarrow.array(values)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                logger.warning(
+                    f"Column {name} of the table has values of different types, "
+                    f"converting them to strings"
+                )
+                arrays[name] = pyarrow.array(
+                    [None if v is None else str(v) for v in values], pyarrow.string()
+                )
+        return pyarrow.Table.from_pydict(arrays)
+
+
+class _HostSelection(Dict[str, None]):
+    """
+    Ordered set of host names, selected using the indexes of an IndexedInventory.
+
+    It can be used as a filter function, ``IndexedInventory.filter`` selects the hosts
+    directly instead of evaluating the filter function for every host.
+    """
+
+    def __call__(self, host: Host, **kwargs: Any) -> bool:
+        return host.name in self
+
+
+class IndexedInventory(Inventory):
+    """
+    Inventory returned by NetBoxInventory2, with indexes that map the value of host
+    attributes (the group attributes, tenant and tag) to the names of the hosts that
+    have that value.
+
+    Arguments:
+        indexes: host names by value, by attribute
+        metadata: information about the load, ``loaded_at`` (timestamp of the moment the
+            data was requested from NetBox), ``age`` (seconds since ``loaded_at``) and
+            ``stale`` (whether the inventory was built from a snapshot)
+        table: pyarrow Table with the devices/vm's of the load, if ``table_columns`` is
+            set. Filtered inventories don't have a table.
+    """
+
+    __slots__ = ("indexes", "metadata", "table")
+
+    def __init__(
+        self,
+        hosts: Hosts,
+        groups: Optional[Groups] = None,
+        defaults: Optional[Defaults] = None,
+        indexes: Optional[Dict[str, Dict[str, Dict[str, None]]]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        table: Optional["pyarrow.Table"] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(hosts=hosts, groups=groups, defaults=defaults, **kwargs)
+        self.indexes = indexes or {}
+        self.metadata = metadata or {}
+        self.table = table
+
+    def lookup(self, **kwargs: Union[str, Iterable[str]]) -> _HostSelection:
+        """
+        Returns the names of the hosts that match all the given attributes, e.g.
+        ``lookup(site="site1", device_role=["core", "edge"])``. Multiple values for
+        an attribute select the hosts that match any of the values.
+        """
+        selections = []
+        for attribute, values in kwargs.items():
+            index = self.indexes.get(attribute, {})
+            if isinstance(values, str):
+                values = [values]
+            selection: Dict[str, None] = {}
+            for value in values:
+                selection.update(index.get(value, {}))
+            selections.append(selection)
+
+        if not selections:
+            return _HostSelection((n, None) for n in self.hosts)
+
+        selections.sort(key=len)
+        return _HostSelection(
+            (n, None)
+            for n in selections[0]
+            if n in self.hosts and all(n in s for s in selections[1:])
+        )
+
+    def select(self, **kwargs: Union[str, Iterable[str]]) -> "IndexedInventory":
+        """
+        Returns an inventory with the hosts that match all the given attributes,
+        see ``lookup``
+        """
+        return self.filter(self.lookup(**kwargs))
+
+    def filter(
+        self,
+        filter_obj: Optional[Callable[..., bool]] = None,
+        filter_func: Optional[Callable[..., bool]] = None,
+        **kwargs: Any,
+    ) -> "IndexedInventory":
+        filter_func = filter_obj or filter_func
+        if isinstance(filter_func, _HostSelection):
+            hosts = Hosts({n: self.hosts[n] for n in filter_func if n in self.hosts})
+        else:
+            hosts = super().filter(filter_func=filter_func, **kwargs).hosts
+        return IndexedInventory(
+            hosts=hosts,
+            groups=self.groups,
+            defaults=self.defaults,
+            indexes=self.indexes,
+            metadata=self.metadata,
+        )
+
+
+class _ConfigContextFetcher:
+    """
+    Requests config contexts from NetBox for lazily loaded host data.
+
+    Only the settings needed to connect to NetBox are kept, so host data can be pickled
+    without the inventory plugin. Fetchers with the same settings compare equal, so
+    hosts unpickled separately are still prefetched together.
+    """
+
+    def __init__(
+        self,
+        nb_url: str,
+        headers: Dict[str, Any],
+        ssl_verify: Union[bool, str, None],
+        batch_size: int,
+        max_workers: int,
+        request_timeout: Optional[float],
+    ) -> None:
+        self.nb_url = nb_url
+        self.headers = headers
+        self.ssl_verify = ssl_verify
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.request_timeout = request_timeout
+        # inventory plugin used to send the requests, created when first needed
+        self.inventory: Optional["NetBoxInventory2"] = None
+
+    def _key(self) -> Tuple[Any, ...]:
+        return (
+            self.nb_url,
+            tuple(sorted(self.headers.items())),
+            self.ssl_verify,
+            self.batch_size,
+            self.max_workers,
+            self.request_timeout,
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _ConfigContextFetcher) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {**self.__dict__, "inventory": None}
+
+    def fetch(self, endpoint: str, datas: List["_LazyConfigContextData"]) -> None:
+        if self.inventory is None:
+            self.inventory = NetBoxInventory2(
+                nb_url=self.nb_url,
+                ssl_verify=True if self.ssl_verify is None else self.ssl_verify,
+                batch_size=self.batch_size,
+                max_workers=self.max_workers,
+                request_timeout=self.request_timeout,
+            )
+            self.inventory.session.headers.update(self.headers)
+        self.inventory._fetch_config_contexts(endpoint, datas)
+
+
+class _LazyConfigContextData(Dict[str, Any]):
+    """
+    Host data of a device/vm that was fetched without its config context. The config
+    context is requested from NetBox when it is first accessed.
+    """
+
+    def __init__(
+        self, data: Dict[str, Any], fetcher: _ConfigContextFetcher, endpoint: str
+    ) -> None:
+        super().__init__(data)
+        self.fetcher = fetcher
+        self.endpoint = endpoint
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (self.__class__, (dict(self), self.fetcher, self.endpoint))
+
+    def __missing__(self, key: str) -> Any:
+        if key != "config_context":
+            raise KeyError(key)
+        self.fetcher.fetch(self.endpoint, [self])
+        return dict.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def prefetch_config_context(hosts: Iterable[Host]) -> None:
+    """
+    Requests the config context of hosts loaded by NetBoxInventory2 with
+    ``lazy_config_context`` enabled, in batched concurrent requests.
+
+    Hosts that already have their config context, or that weren't loaded
+    lazily, are skipped.
+
+    Arguments:
+        hosts: hosts to prefetch the config context for,
+            e.g. ``nr.filter(site="site1").inventory.hosts.values()``
+    """
+    pending: Dict[Tuple[_ConfigContextFetcher, str], List[_LazyConfigContextData]] = {}
+
+    for host in hosts:
+        data = host.data
+        if isinstance(data, _LazyConfigContextData) and "config_context" not in data:
+            pending.setdefault((data.fetcher, data.endpoint), []).append(data)
+
+    for (fetcher, endpoint), datas in pending.items():
+        fetcher.fetch(endpoint, datas)
+
+
 class NBInventory:
     def __init__(
         self,
@@ -190,6 +658,133 @@ class NBInventory:
         return Inventory(hosts=hosts, groups=groups, defaults=defaults)
 
 
+def _choose_pages(
+    objects: int,
+    page_limit: int,
+    overhead: float,
+    per_object: float,
+    max_workers: int,
+) -> Tuple[int, int]:
+    """
+    Returns the page size and number of workers with the lowest estimated duration to
+    request ``objects`` objects, where a page of n objects takes ``overhead + n *
+    per_object`` seconds and a worker requests one page at a time. Of the estimates
+    within 10% of the lowest, the one with the fewest workers is chosen, as every
+    worker adds load on NetBox.
+    """
+    options = []
+    for workers in range(1, max_workers + 1):
+        # spread the objects evenly over rounds of concurrent requests
+        rounds = -(-objects // (page_limit * workers))
+        page_size = -(-objects // (rounds * workers))
+        used = min(workers, -(-objects // page_size))
+        options.append((rounds * (overhead + page_size * per_object), used, page_size))
+
+    lowest = min(duration for duration, _, _ in options)
+    _, workers, page_size = next(o for o in options if o[0] <= lowest * 1.1)
+    return page_size, workers
+
+
+class _EndpointPlan(NamedTuple):
+    endpoint: str
+    objects: int
+    # None when the page limit is unknown, the endpoint is requested page by page
+    page_limit: Optional[int]
+    # estimated duration of a request without results, and per object, in seconds
+    overhead: float
+    per_object: float
+    # None when all objects are requested using the default page size
+    page_size: Optional[int]
+    workers: int
+
+    @property
+    def pages(self) -> int:
+        if not self.page_size:
+            return 1
+        return max(1, -(-self.objects // self.page_size))
+
+    @property
+    def duration(self) -> float:
+        page_size = self.page_size or self.objects
+        rounds = -(-self.pages // self.workers)
+        return rounds * (self.overhead + page_size * self.per_object)
+
+
+class LoadPlan:
+    """
+    Strategy used by NetBoxInventory2 to load the inventory, chosen by ``plan`` from
+    the object counts, page limits and response times returned by probing the NetBox
+    API endpoints.
+
+    Arguments:
+        nb_url: NetBox url
+        source: ``netbox``, or ``snapshot`` when probing NetBox failed and the inventory
+            is loaded from the snapshot file
+        endpoints: page size and workers of the devices/vm's endpoints, by endpoint
+        batch_size: number of devices/vm's per request for related objects
+        related_requests: expected number of requests for related objects (interfaces,
+            IP addresses and platforms)
+        probe_requests: number of requests used to probe the endpoints
+        error: error that occurred while probing NetBox
+    """
+
+    def __init__(
+        self,
+        nb_url: str,
+        source: str,
+        endpoints: Dict[str, _EndpointPlan],
+        batch_size: int,
+        related_requests: int,
+        probe_requests: int,
+        error: Optional[str] = None,
+    ) -> None:
+        self.nb_url = nb_url
+        self.source = source
+        self.endpoints = endpoints
+        self.batch_size = batch_size
+        self.related_requests = related_requests
+        self.probe_requests = probe_requests
+        self.error = error
+
+    @property
+    def expected_requests(self) -> int:
+        if self.source != "netbox":
+            return 0
+        pages = sum(e.pages for e in self.endpoints.values())
+        return pages + self.related_requests
+
+    def explain(self) -> str:
+        lines = [f"NetBox instance: {self.nb_url}", f"source: {self.source}"]
+
+        if self.error:
+            lines.append(f"error: {self.error}")
+
+        for e in self.endpoints.values():
+            lines.append(
+                f"{e.endpoint}: {e.objects} objects, page limit {e.page_limit or 'unknown'}, "
+                f"{e.overhead * 1000:.0f}ms per request and "
+                f"{e.per_object * 1000:.2f}ms per object"
+            )
+            if e.page_size:
+                lines.append(
+                    f"  {e.pages} pages of {e.page_size} objects using {e.workers} "
+                    f"workers, estimated {e.duration * 1000:.0f}ms"
+                )
+            else:
+                lines.append("  requested page by page")
+
+        if self.related_requests:
+            lines.append(
+                f"related objects: {self.related_requests} requests in batches of "
+                f"{self.batch_size} devices/vm's"
+            )
+        lines.append(
+            f"expected requests: {self.expected_requests} "
+            f"(after {self.probe_requests} probe requests)"
+        )
+        return "\n".join(lines)
+
+
 class NetBoxInventory2:
     """
     Inventory plugin that uses `NetBox <https://github.com/netbox-community/netbox>`_ as backend.
@@ -218,8 +813,68 @@ class NetBoxInventory2:
         defaults_file: path to file with defaults definition. If it doesn't exist it will be skipped
         ignore_file_permission_errors: Ignore permission errors for the group and defaults file
             (defaults to False)
+        batch_size: Maximum number of values sent in a single filtered request when resolving
+            related objects (defaults to 100)
+        include_interfaces: Add the interfaces of each device/vm to the ``interfaces`` key of
+            the host's data attribute (defaults to False)
+        include_ip_addresses: Add the IP addresses of each device/vm to the ``ip_addresses``
+            key of the host's data attribute (defaults to False)
+        max_workers: Maximum number of concurrent requests used for batched requests
+            (defaults to 4)
+        lazy_config_context: Exclude the config context from the devices/vm's requests and
+            request it when it is first accessed through the host's data attribute.
+            Use ``prefetch_config_context`` to request it for many hosts at once.
+            (defaults to False)
+        shared_inventory_file: path to a file the loaded inventory is written to, so that it
+            can be shared with worker processes through NetBoxSharedInventory
+            (defaults to None)
+        file_cache_dir: directory used to cache the parsed group and defaults file across
+            processes. The parsed files are always cached in memory. (defaults to None)
+        group_attributes: Attributes used to assign hosts to groups, group name prefix mapped
+            to one or more dot separated paths in the device/vm, e.g. ``tenant.slug``,
+            ``tags.slug`` or ``custom_fields.my_field``
+            (defaults to ``NetBoxInventory2.DEFAULT_GROUP_ATTRIBUTES``)
+        request_timeout: Timeout in seconds for each request to NetBox (defaults to None)
+        load_timeout: Maximum time in seconds for requesting the inventory from NetBox
+            (defaults to None)
+        snapshot_file: path to a file the data requested from NetBox is written to after
+            every successful load. When requesting the inventory fails or exceeds
+            ``load_timeout``, the inventory is built from this file instead.
+            (defaults to None)
+        table_columns: Build a pyarrow Table of the devices/vm's, available through the
+            ``table`` attribute of the inventory. Column name mapped to a dot separated
+            path in the device/vm, e.g. ``site.slug``. Requires pyarrow.
+            (defaults to None)
+        table_file: path to a Parquet file the table is written to (defaults to None)
+        incremental_load: Reuse the Hosts of the previous load for devices/vm's whose
+            ``last_updated`` timestamp didn't change, and add the names of the ``added``,
+            ``changed`` and ``removed`` hosts to the ``diff`` key of the inventory
+            metadata (defaults to False)
+        auto_plan: Probe the NetBox API endpoints before loading the inventory, and choose
+            the page size and number of workers (up to ``max_workers``) of the
+            devices/vm's requests, and the batch size (up to ``batch_size``) of the
+            related objects requests, from their object count, page limit and response
+            times. The chosen LoadPlan is added to the ``plan`` key of the inventory
+            metadata. (defaults to False)
     """
 
+    # number of objects requested to estimate the response time per object
+    PLAN_SAMPLE_SIZE = 50
+
+    DEFAULT_GROUP_ATTRIBUTES: Dict[str, Union[str, List[str]]] = {
+        "site": "site.slug",
+        "platform": [
+            "platform",  # older netbox versions
+            "platform.slug",
+        ],
+        "device_role": [
+            "device_role.slug",
+            "role.slug",  # vm's
+        ],
+        "manufacturer": "device_type.manufacturer.slug",
+        "device_type": "device_type.slug",
+    }
+
     def __init__(
         self,
         nb_url: Optional[str] = None,
@@ -233,6 +888,21 @@ class NetBoxInventory2:
         group_file: str = "groups.yaml",
         defaults_file: str = "defaults.yaml",
         ignore_file_permission_errors: bool = False,
+        batch_size: int = 100,
+        include_interfaces: bool = False,
+        include_ip_addresses: bool = False,
+        max_workers: int = 4,
+        lazy_config_context: bool = False,
+        shared_inventory_file: Optional[str] = None,
+        file_cache_dir: Optional[str] = None,
+        group_attributes: Optional[Dict[str, Union[str, List[str]]]] = None,
+        request_timeout: Optional[float] = None,
+        load_timeout: Optional[float] = None,
+        snapshot_file: Optional[str] = None,
+        table_columns: Optional[Dict[str, str]] = None,
+        table_file: Optional[str] = None,
+        incremental_load: bool = False,
+        auto_plan: bool = False,
         **kwargs: Any,
     ) -> None:
         filter_parameters = filter_parameters or {}
@@ -254,73 +924,309 @@ class NetBoxInventory2:
         self.group_file = Path(group_file).expanduser()
         self.defaults_file = Path(defaults_file).expanduser()
         self.ignore_file_permission_errors = ignore_file_permission_errors
+        self.batch_size = batch_size
+        self.include_interfaces = include_interfaces
+        self.include_ip_addresses = include_ip_addresses
+        self.max_workers = max_workers
+        self.lazy_config_context = lazy_config_context
+        self.shared_inventory_file = (
+            Path(shared_inventory_file).expanduser() if shared_inventory_file else None
+        )
+        self.file_cache_dir = (
+            Path(file_cache_dir).expanduser() if file_cache_dir else None
+        )
+
+        self.group_attributes = group_attributes or self.DEFAULT_GROUP_ATTRIBUTES
+        self._group_extractors = [
+            _compile_group_path(name, path)
+            for name, paths in self.group_attributes.items()
+            for path in ([paths] if isinstance(paths, str) else paths)
+        ]
+
+        self.request_timeout = request_timeout
+        self.load_timeout = load_timeout
+        self.snapshot_file = Path(snapshot_file).expanduser() if snapshot_file else None
+        self._deadline: Optional[float] = None
+        self.table_columns = table_columns
+        self.table_file = Path(table_file).expanduser() if table_file else None
+        self.incremental_load = incremental_load
+        self.auto_plan = auto_plan
+
+        # hosts of the previous load with the version key of their device/vm, by name
+        self._hosts_cache: Dict[str, Tuple[Optional[Tuple[Any, ...]], Host]] = {}
+
+        # number of requests sent by the last plan to probe NetBox
+        self._probe_requests = 0
+
+        # related objects (platforms, ...) resolved by earlier loads, per endpoint and key
+        self._related_objects: Dict[str, Dict[Any, Dict[str, Any]]] = {}
 
         if self.use_platform_slug and self.use_platform_napalm_driver:
             raise ValueError(
                 "Only one of use_platform_slug and use_platform_napalm_driver can be set to true"
             )
 
+        if self.table_file and not self.table_columns:
+            raise ValueError("table_file requires table_columns to be set")
+
+        if self.table_columns and pyarrow is None:
+            raise ImportError(
+                "table_columns requires pyarrow, install nornir_netbox[table]"
+            )
+
+    def _extract_device_groups(self, device: Dict[str, Any]) -> List[str]:
+        groups: Dict[str, None] = {}
+        for extract in self._group_extractors:
+            groups.update((group, None) for group in extract(device))
+        return list(groups)
+
     @staticmethod
-    def _extract_device_groups(device: Dict[str, Any]) -> List[str]:
-        extract_group_attributes = [
-            {"name": "site", "path": ["site", "slug"]},
-            {"name": "platform", "path": ["platform"]},  # older netbox versions
-            {"name": "platform", "path": ["platform", "slug"]},
-            {"name": "device_role", "path": ["device_role", "slug"]},
-            {"name": "device_role", "path": ["role", "slug"]},  # vm's
-            {"name": "manufacturer", "path": ["device_type", "manufacturer", "slug"]},
-            {"name": "device_type", "path": ["device_type", "slug"]},
-        ]
+    def _extract_device_index_values(
+        device: Dict[str, Any], groups: Iterable[str]
+    ) -> List[Tuple[str, str]]:
+        values = []
+        for group in groups:
+            attribute, _, value = group.partition("__")
+            values.append((attribute, value))
 
-        groups = []
-        for group in extract_group_attributes:
-            data = device
-            for hop in group.get("path", []):
-                v = data.get(hop)
-                if isinstance(v, dict):
-                    data = v
-                elif isinstance(v, str) and group.get("path", [])[-1] == hop:
-                    groups.append(f"{group.get('name', '')}__{v}")
-                else:
-                    # Unable to extract group
-                    continue
-        return groups
+        if isinstance(device.get("tenant"), dict) and device["tenant"].get("slug"):
+            values.append(("tenant", device["tenant"]["slug"]))
 
-    def load(self) -> Inventory:
-        yml = ruamel.yaml.YAML(typ="safe")
+        for tag in device.get("tags") or []:
+            values.append(("tag", tag["slug"] if isinstance(tag, dict) else tag))
+
+        return values
+
+    def _get_params(self) -> Dict[str, Any]:
+        params = self.filter_parameters
+
+        if self.lazy_config_context:
+            params = {**params, "exclude": "config_context"}
+
+        return params
+
+    def _get_endpoints(self) -> List[str]:
+        endpoints = ["dcim/devices"]
+
+        if self.include_vms:
+            endpoints.append("virtualization/virtual-machines")
+
+        return endpoints
+
+    def _fetch(
+        self, plan: Optional[LoadPlan] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[Any, Dict[str, Any]]]:
+        """
+        Requests the devices, vm's and related objects used to build the inventory.
+        """
+        params = self._get_params()
+
+        nb_devices: List[Dict[str, Any]] = []
+
+        nb_devices = self._get_planned_resources("dcim/devices", params, plan)
+
+        nb_vms: List[Dict[str, Any]] = []
+
+        if self.include_vms:
+            nb_vms = self._get_planned_resources(
+                "virtualization/virtual-machines", params, plan
+            )
+
+        batch_size = plan.batch_size if plan else None
+
+        if self.include_interfaces:
+            self._attach_related_resources(
+                nb_devices, "interfaces", "dcim/interfaces", "device", batch_size
+            )
+            self._attach_related_resources(
+                nb_vms,
+                "interfaces",
+                "virtualization/interfaces",
+                "virtual_machine",
+                batch_size,
+            )
+
+        if self.include_ip_addresses:
+            self._attach_related_resources(
+                nb_devices, "ip_addresses", "ipam/ip-addresses", "device", batch_size
+            )
+            self._attach_related_resources(
+                nb_vms,
+                "ip_addresses",
+                "ipam/ip-addresses",
+                "virtual_machine",
+                batch_size,
+            )
 
-        platforms: List[Dict[str, Any]] = []
+        platforms: Dict[Any, Dict[str, Any]] = {}
 
         if self.use_platform_napalm_driver:
-            platforms = self._get_resources(
-                url=f"{self.nb_url}/api/dcim/platforms/?limit=0", params={}
+            platforms = self._resolve_related(
+                "dcim/platforms",
+                "slug",
+                (
+                    device["platform"]["slug"]
+                    for device in nb_devices + nb_vms
+                    if isinstance(device.get("platform"), dict)
+                ),
+                batch_size,
             )
 
-        nb_devices: List[Dict[str, Any]] = []
+        return nb_devices, nb_vms, platforms
+
+    def plan(self) -> LoadPlan:
+        """
+        Probes the NetBox API endpoints used to load the inventory for their object
+        count, page limit and response times, and chooses the page size and workers used
+        to request them, and the batch size used to request related objects. Falls back
+        to the snapshot file, if any, when probing fails.
+        """
+        params = self._get_params()
+        self._probe_requests = 0
+
+        try:
+            endpoints = {e: self._probe(e, params) for e in self._get_endpoints()}
 
-        nb_devices = self._get_resources(
-            url=f"{self.nb_url}/api/dcim/devices/?limit=0",
-            params=self.filter_parameters,
+            platforms = None
+            if self.use_platform_napalm_driver:
+                self._probe_requests += 1
+                platforms = self._get_page(
+                    f"{self.nb_url}/api/dcim/platforms/?limit=1", {}
+                )
+        except (requests.RequestException, ValueError) as e:
+            if not self.snapshot_file or not self.snapshot_file.exists():
+                raise
+
+            return LoadPlan(
+                self.nb_url,
+                "snapshot",
+                {},
+                self.batch_size,
+                0,
+                self._probe_requests,
+                error=str(e),
+            )
+
+        # related objects are requested in batches spread over the workers, but not
+        # smaller than the number of objects whose transfer takes as long as a request
+        devices = endpoints["dcim/devices"]
+        minimum = (
+            -(-devices.overhead // devices.per_object)
+            if devices.per_object
+            else self.batch_size
+        )
+        parents = max(endpoint.objects for endpoint in endpoints.values())
+        batch_size = int(
+            max(1, min(self.batch_size, max(-(-parents // self.max_workers), minimum)))
         )
 
-        if self.include_vms:
-            nb_devices.extend(
-                self._get_resources(
-                    url=f"{self.nb_url}/api/virtualization/virtual-machines/?limit=0",
-                    params=self.filter_parameters,
+        def batches(count: int) -> int:
+            return -(-count // batch_size)
+
+        related_requests = 0
+        for endpoint in endpoints.values():
+            related_requests += batches(endpoint.objects) * (
+                self.include_interfaces + self.include_ip_addresses
+            )
+        if platforms:
+            total = sum(endpoint.objects for endpoint in endpoints.values())
+            related_requests += batches(min(platforms["count"], total))
+
+        return LoadPlan(
+            self.nb_url,
+            "netbox",
+            endpoints,
+            batch_size,
+            related_requests,
+            self._probe_requests,
+        )
+
+    def explain(self) -> str:
+        """
+        Returns a report of the plan that would be used to load the inventory
+        """
+        return self.plan().explain()
+
+    def load(self) -> IndexedInventory:
+        self._deadline = (
+            time.monotonic() + self.load_timeout if self.load_timeout else None
+        )
+
+        plan: Optional[LoadPlan] = None
+
+        try:
+            if self.auto_plan:
+                plan = self.plan()
+
+                if plan.source == "snapshot":
+                    raise ValueError(plan.error)
+
+            nb_devices, nb_vms, platforms = self._fetch(plan=plan)
+            metadata: Dict[str, Any] = {"loaded_at": time.time(), "stale": False}
+
+            if self.snapshot_file:
+                self._write_snapshot(
+                    nb_devices, nb_vms, platforms, metadata["loaded_at"]
                 )
+        except (requests.RequestException, ValueError) as e:
+            if not self.snapshot_file or not self.snapshot_file.exists():
+                raise
+
+            logger.warning(
+                f"Failed to load the inventory from NetBox instance {self.nb_url} ({e}), "
+                f"using snapshot {self.snapshot_file}"
             )
+            nb_devices, nb_vms, platforms, loaded_at = self._read_snapshot()
+            metadata = {"loaded_at": loaded_at, "stale": True, "error": str(e)}
+        finally:
+            self._deadline = None
+
+        # built from the same data whether it was requested or read from the snapshot,
+        # including the related objects attached to the devices/vm's
+        table = None
+        if self.table_columns:
+            table = _TableBuilder(self.table_columns)
+            table.add(nb_devices)
+            table.add(nb_vms)
+
+        metadata["age"] = time.time() - metadata["loaded_at"]
+
+        if plan:
+            metadata["plan"] = plan
+
+        if self.lazy_config_context:
+            fetcher = _ConfigContextFetcher(
+                self.nb_url,
+                dict(self.session.headers),
+                self.session.verify,
+                self.batch_size,
+                self.max_workers,
+                self.request_timeout,
+            )
+            fetcher.inventory = self
+            nb_devices = [
+                _LazyConfigContextData(device, fetcher, "dcim/devices")
+                for device in nb_devices
+            ]
+            nb_vms = [
+                _LazyConfigContextData(vm, fetcher, "virtualization/virtual-machines")
+                for vm in nb_vms
+            ]
+
+        nb_devices.extend(nb_vms)
 
         hosts = Hosts()
         groups = Groups()
         defaults = Defaults()
+        indexes: Dict[str, Dict[str, Dict[str, None]]] = {}
         defaults_dict: Dict[str, Any] = {}
         groups_dict: Dict[str, Any] = {}
 
         if self.defaults_file.exists():
             try:
-                with self.defaults_file.open("r") as f:
-                    defaults_dict = yml.load(f) or {}
+                defaults_dict = (
+                    _load_yaml_file(self.defaults_file, self.file_cache_dir) or {}
+                )
             except PermissionError:
                 if not self.ignore_file_permission_errors:
                     raise
@@ -333,8 +1239,9 @@ class NetBoxInventory2:
 
         if self.group_file.exists():
             try:
-                with self.group_file.open("r") as f:
-                    groups_dict = yml.load(f) or {}
+                groups_dict = (
+                    _load_yaml_file(self.group_file, self.file_cache_dir) or {}
+                )
 
             except PermissionError:
                 if not self.ignore_file_permission_errors:
@@ -350,73 +1257,418 @@ class NetBoxInventory2:
         for g in groups.values():
             g.groups = ParentGroups([groups[g] for g in g.groups])
 
-        for device in nb_devices:
-            serialized_device: Dict[Any, Any] = {}
-            serialized_device["data"] = device
+        # groups of the hosts with the same group names, resolved once
+        parent_groups: Dict[Tuple[str, ...], List[Group]] = {}
 
-            if self.flatten_custom_fields:
-                for cf, value in device["custom_fields"].items():
-                    serialized_device["data"][cf] = value
-                serialized_device["data"].pop("custom_fields")
+        # host cache of the next load, and the differences with the previous load
+        hosts_cache: Dict[str, Tuple[Optional[Tuple[Any, ...]], Host]] = {}
+        diff: Dict[str, List[str]] = {"added": [], "changed": [], "removed": []}
 
-            hostname = None
-            if device.get("primary_ip"):
-                hostname = device.get("primary_ip", {}).get("address", "").split("/")[0]
-            else:
-                if device.get("name") is not None:
-                    hostname = device["name"]
-            serialized_device["hostname"] = hostname
+        for device in nb_devices:
+            groups_extracted = tuple(self._extract_device_groups(device))
+
+            if self.incremental_load:
+                version_key = _get_version_key(device)
+                cache_key = _get_host_name(device)
+                cached = self._hosts_cache.get(cache_key)
+
+                if cached and version_key is not None and cached[0] == version_key:
+                    host = cached[1]
+                    host.defaults = defaults
+                    # changes of the rendered config context don't update last_updated
+                    if isinstance(host.data, _LazyConfigContextData):
+                        host.data.pop("config_context", None)
+                else:
+                    host = self._get_host(device, platforms, defaults)
+                    diff["changed" if cached else "added"].append(host.name)
 
-            if isinstance(device["platform"], dict) and self.use_platform_slug:
-                platform = device["platform"].get("slug")
-            elif (
-                isinstance(device["platform"], dict) and self.use_platform_napalm_driver
-            ):
-                platform = [
-                    platform
-                    for platform in platforms
-                    if device["platform"]["slug"] == platform["slug"]
-                ][0]["napalm_driver"]
-            elif isinstance(device["platform"], dict):
-                platform = device["platform"].get("name")
+                hosts_cache[cache_key] = (version_key, host)
             else:
-                platform = device["platform"]
+                host = self._get_host(device, platforms, defaults)
 
-            serialized_device["platform"] = platform
+            name = host.name
+            hosts[name] = host
 
-            name = serialized_device["data"].get("name") or str(
-                serialized_device["data"].get("id")
-            )
+            if groups_extracted not in parent_groups:
+                for group in groups_extracted:
+                    if group not in groups.keys():
+                        groups[group] = _get_inventory_element(
+                            Group, {}, group, defaults
+                        )
+                parent_groups[groups_extracted] = [groups[g] for g in groups_extracted]
 
-            hosts[name] = _get_inventory_element(
-                Host, serialized_device, name, defaults
-            )
+            # every host has its own list, so changing the groups of a host doesn't
+            # affect other hosts
+            hosts[name].groups = ParentGroups(parent_groups[groups_extracted])
 
-            groups_extracted = self._extract_device_groups(device)
+            for attribute, value in self._extract_device_index_values(
+                device, groups_extracted
+            ):
+                indexes.setdefault(attribute, {}).setdefault(value, {})[name] = None
+
+        if self.incremental_load:
+            diff["removed"] = [
+                host.name
+                for key, (_, host) in self._hosts_cache.items()
+                if key not in hosts_cache
+            ]
+            metadata["diff"] = diff
+            self._hosts_cache = hosts_cache
+
+        inventory = IndexedInventory(
+            hosts=hosts,
+            groups=groups,
+            defaults=defaults,
+            indexes=indexes,
+            metadata=metadata,
+            table=table.build() if table else None,
+        )
 
-            for group in groups_extracted:
-                if group not in groups.keys():
-                    groups[group] = _get_inventory_element(Group, {}, group, defaults)
+        if self.table_file:
+            pyarrow.parquet.write_table(inventory.table, str(self.table_file))
 
-            hosts[name].groups = ParentGroups([groups[g] for g in groups_extracted])
+        if self.shared_inventory_file:
+            _write_shared_inventory(inventory, self.shared_inventory_file)
 
-        return Inventory(hosts=hosts, groups=groups, defaults=defaults)
+        return inventory
 
-    def _get_resources(self, url: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _get_resources(
+        self,
+        url: str,
+        params: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
 
         resources: List[Dict[str, Any]] = []
 
         while url:
-            r = self.session.get(url, params=params)
+            resp = self._get_page(url, params)
+            resources.extend(resp.get("results"))
+            url = resp.get("next")
 
-            if not r.status_code == 200:
+        return resources
+
+    def _get_page(self, url: str, params: Dict[str, Any]) -> Any:
+        timeout = self.request_timeout
+
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
                 raise ValueError(
-                    f"Failed to get data from NetBox instance {self.nb_url}"
+                    f"Loading the inventory from NetBox instance {self.nb_url} "
+                    f"exceeded load_timeout"
                 )
+            timeout = min(timeout, remaining) if timeout else remaining
 
-            resp = r.json()
-            resources.extend(resp.get("results"))
+        r = self.session.get(url, params=params, timeout=timeout)
 
-            url = resp.get("next")
+        if not r.status_code == 200:
+            raise ValueError(f"Failed to get data from NetBox instance {self.nb_url}")
+
+        return r.json()
+
+    def _probe(self, endpoint: str, params: Dict[str, Any]) -> _EndpointPlan:
+        url = f"{self.nb_url}/api/{endpoint}/"
+
+        # a sample page, for the object count and the response time per object
+        self._probe_requests += 1
+        start = time.monotonic()
+        sample = self._get_page(f"{url}?limit={self.PLAN_SAMPLE_SIZE}", params)
+        sample_duration = time.monotonic() - start
+        objects = sample["count"]
+
+        if objects <= len(sample["results"]):
+            return _EndpointPlan(endpoint, objects, None, sample_duration, 0, None, 1)
+
+        # a page past the last object has no results, for the response time of a
+        # request, and its link to the previous page contains the page limit applied
+        # by NetBox
+        self._probe_requests += 1
+        start = time.monotonic()
+        empty = self._get_page(f"{url}?limit={objects}&offset={objects}", params)
+        overhead = time.monotonic() - start
+        per_object = max(sample_duration - overhead, 0) / len(sample["results"])
+
+        page_limit = None
+        if empty.get("previous"):
+            query = parse_qs(urlsplit(empty["previous"]).query)
+            page_limit = int(query.get("limit", ["0"])[0]) or None
+
+        if not page_limit:
+            return _EndpointPlan(endpoint, objects, None, overhead, per_object, None, 1)
+
+        page_size, workers = _choose_pages(
+            objects, page_limit, overhead, per_object, self.max_workers
+        )
+        return _EndpointPlan(
+            endpoint, objects, page_limit, overhead, per_object, page_size, workers
+        )
+
+    def _get_planned_resources(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        plan: Optional[LoadPlan],
+    ) -> List[Dict[str, Any]]:
+        """
+        Requests all objects of ``endpoint``. When a plan is given, the pages are
+        requested concurrently by offset, using the page size and workers of the plan.
+        """
+        url = f"{self.nb_url}/api/{endpoint}/"
+        endpoint_plan = plan.endpoints.get(endpoint) if plan else None
+
+        if not endpoint_plan or not endpoint_plan.page_size:
+            return self._get_resources(url=f"{url}?limit=0", params=params)
+
+        page_size = endpoint_plan.page_size
+
+        if endpoint_plan.pages <= 1 or endpoint_plan.workers <= 1:
+            return self._get_resources(url=f"{url}?limit={page_size}", params=params)
+
+        resources: List[Dict[str, Any]] = []
+        resp: Dict[str, Any] = {}
+
+        with ThreadPoolExecutor(max_workers=endpoint_plan.workers) as executor:
+            for resp in executor.map(
+                lambda offset: self._get_page(
+                    f"{url}?limit={page_size}&offset={offset}", params
+                ),
+                range(0, endpoint_plan.objects, page_size),
+            ):
+                resources.extend(resp["results"])
+
+        # objects added since the endpoint was probed
+        if resp.get("next"):
+            resources.extend(self._get_resources(url=resp["next"], params=params))
 
         return resources
+
+    def _get_host(
+        self,
+        device: Dict[str, Any],
+        platforms: Dict[Any, Dict[str, Any]],
+        defaults: Defaults,
+    ) -> Host:
+        serialized_device: Dict[Any, Any] = {}
+        serialized_device["data"] = device
+
+        if self.flatten_custom_fields:
+            for cf, value in device["custom_fields"].items():
+                serialized_device["data"][cf] = value
+            serialized_device["data"].pop("custom_fields")
+
+        hostname = None
+        if device.get("primary_ip"):
+            hostname = device.get("primary_ip", {}).get("address", "").split("/")[0]
+        else:
+            if device.get("name") is not None:
+                hostname = device["name"]
+        serialized_device["hostname"] = hostname
+
+        if isinstance(device["platform"], dict) and self.use_platform_slug:
+            platform = device["platform"].get("slug")
+        elif isinstance(device["platform"], dict) and self.use_platform_napalm_driver:
+            platform = platforms.get(device["platform"]["slug"], {}).get(
+                "napalm_driver"
+            )
+        elif isinstance(device["platform"], dict):
+            platform = device["platform"].get("name")
+        else:
+            platform = device["platform"]
+
+        serialized_device["platform"] = platform
+
+        name = _get_host_name(serialized_device["data"])
+
+        return _get_inventory_element(Host, serialized_device, name, defaults)
+
+    def _write_snapshot(
+        self,
+        nb_devices: List[Dict[str, Any]],
+        nb_vms: List[Dict[str, Any]],
+        platforms: Dict[Any, Dict[str, Any]],
+        loaded_at: float,
+    ) -> None:
+        snapshot = {
+            "loaded_at": loaded_at,
+            "devices": nb_devices,
+            "vms": nb_vms,
+            "platforms": platforms,
+        }
+        path = self.snapshot_file
+        assert path is not None
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+    def _read_snapshot(
+        self,
+    ) -> Tuple[
+        List[Dict[str, Any]], List[Dict[str, Any]], Dict[Any, Dict[str, Any]], float
+    ]:
+        assert self.snapshot_file is not None
+        with self.snapshot_file.open("r") as f:
+            snapshot = json.load(f)
+        return (
+            snapshot["devices"],
+            snapshot["vms"],
+            snapshot["platforms"],
+            snapshot["loaded_at"],
+        )
+
+    def _resolve_related(
+        self,
+        endpoint: str,
+        key: str,
+        values: Iterable[Any],
+        batch_size: Optional[int] = None,
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Returns the objects of a NetBox API endpoint indexed by ``key``.
+
+        Only the objects referenced in ``values`` are requested from NetBox, in batches
+        of ``batch_size`` values per request. Resolved objects are kept on the plugin
+        instance, so subsequent loads only request objects that weren't seen before.
+        """
+        index = self._related_objects.setdefault(f"{endpoint}:{key}", {})
+        missing = sorted({v for v in values if v is not None and v not in index})
+
+        for resource in self._get_resources_batched(endpoint, key, missing, batch_size):
+            index[resource.get(key)] = resource
+
+        return index
+
+    def _get_resources_batched(
+        self,
+        endpoint: str,
+        key: str,
+        values: List[Any],
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns the objects of a NetBox API endpoint for which ``key`` matches one of
+        ``values``. Values are split in batches of ``batch_size`` (defaults to the
+        ``batch_size`` of the plugin), which are requested concurrently using up to
+        ``max_workers`` threads.
+        """
+        url = f"{self.nb_url}/api/{endpoint}/?limit=0"
+        batches = list(_chunked(values, batch_size or self.batch_size))
+
+        if len(batches) <= 1 or self.max_workers <= 1:
+            pages = [self._get_resources(url=url, params={key: b}) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pages = list(
+                    executor.map(
+                        lambda b: self._get_resources(url=url, params={key: b}),
+                        batches,
+                    )
+                )
+
+        return [resource for page in pages for resource in page]
+
+    def _attach_related_resources(
+        self,
+        resources: List[Dict[str, Any]],
+        attribute: str,
+        endpoint: str,
+        parent: str,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        """
+        Requests the objects of ``endpoint`` that belong to ``resources`` (devices or
+        virtual machines, as indicated by ``parent``) and stores them as a list in the
+        ``attribute`` key of each resource
+        """
+        related: Dict[Any, List[Dict[str, Any]]] = {r["id"]: [] for r in resources}
+
+        for resource in self._get_resources_batched(
+            endpoint, f"{parent}_id", list(related), batch_size
+        ):
+            parent_id = _get_parent_id(resource, parent)
+            if parent_id in related:
+                related[parent_id].append(resource)
+
+        for resource in resources:
+            resource[attribute] = related[resource["id"]]
+
+    def _fetch_config_contexts(
+        self, endpoint: str, datas: List[_LazyConfigContextData]
+    ) -> None:
+        """
+        Requests the config context for the host data of devices/vm's of ``endpoint``
+        """
+        config_contexts = {
+            resource.get("id"): resource.get("config_context")
+            for resource in self._get_resources_batched(
+                endpoint, "id", [data["id"] for data in datas]
+            )
+        }
+
+        for data in datas:
+            data["config_context"] = config_contexts.get(data["id"])
+
+
+class NetBoxSharedInventory:
+    """
+    Inventory plugin that loads an inventory written by NetBoxInventory2 with the
+    ``shared_inventory_file`` option.
+
+    The file is memory mapped read-only, so processes attaching to it share the same
+    pages instead of each holding a copy of the inventory. Only the hosts a process
+    is given are decoded.
+
+    Arguments:
+        shared_inventory_file: path to the file written by NetBoxInventory2
+        hosts: names of the hosts to load, loads all hosts if not set
+            (defaults to None)
+    """
+
+    def __init__(
+        self,
+        shared_inventory_file: str,
+        hosts: Optional[Iterable[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.shared_inventory_file = Path(shared_inventory_file).expanduser()
+        self.hosts = list(hosts) if hosts is not None else None
+
+        with self.shared_inventory_file.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[: len(_SHARED_INVENTORY_MAGIC)] != _SHARED_INVENTORY_MAGIC:
+            raise ValueError(
+                f"{self.shared_inventory_file} is not a NetBoxInventory2 shared inventory"
+            )
+
+        start = len(_SHARED_INVENTORY_MAGIC)
+        (header_length,) = _SHARED_INVENTORY_HEADER.unpack_from(self._mmap, start)
+        start += _SHARED_INVENTORY_HEADER.size
+        end = start + header_length
+        self._header = pickle.loads(self._mmap[start:end])
+        self._data_offset = end
+
+    def host_names(self) -> List[str]:
+        """Returns the names of all hosts in the shared inventory"""
+        return list(self._header["hosts"])
+
+    def load(self) -> Inventory:
+        defaults = _get_defaults(self._header["defaults"])
+
+        groups = Groups()
+        for n, g in self._header["groups"].items():
+            groups[n] = _get_inventory_element(Group, g, n, defaults)
+
+        for n, g in self._header["groups"].items():
+            groups[n].groups = ParentGroups([groups[p] for p in g["groups"]])
+
+        hosts = Hosts()
+        for name in self.hosts if self.hosts is not None else self.host_names():
+            offset, length = self._header["hosts"][name]
+            start = self._data_offset + offset
+            end = start + length
+            host = pickle.loads(self._mmap[start:end])
+            hosts[name] = _get_inventory_element(Host, host, name, defaults)
+            hosts[name].groups = ParentGroups([groups[g] for g in host["groups"]])
+
+        return Inventory(hosts=hosts, groups=groups, defaults=defaults)
@@ -1,14 +1,22 @@
 import json
 import os
+import pickle
 
 from pathlib import Path
 from typing import Any
+from typing import Dict
+from typing import List
 from typing import Type
 from typing import Union
 
+from nornir.core.inventory import Group
 from nornir.core.inventory import Inventory
+from nornir_netbox.plugins.inventory import netbox
+from nornir_netbox.plugins.inventory.netbox import IndexedInventory
 from nornir_netbox.plugins.inventory.netbox import NBInventory
 from nornir_netbox.plugins.inventory.netbox import NetBoxInventory2
+from nornir_netbox.plugins.inventory.netbox import NetBoxSharedInventory
+from nornir_netbox.plugins.inventory.netbox import prefetch_config_context
 
 # We need import below to load fixtures
 import pytest  # noqa
@@ -48,6 +56,93 @@ def _create_mock(
                 )
 
 
+def _create_filtered_mock(
+    requests_mock: Mocker, version: str, application: str, resource: str
+) -> List[Dict[str, Any]]:
+    """initialises a mock object that only returns the results of the requested devices"""
+    with open(f"{BASE_PATH}/mocked/{version}/{resource}.json", "r") as f:
+        results: List[Dict[str, Any]] = json.load(f)["results"]
+
+    def _filter(request: Any, context: Any) -> Any:
+        device_ids = [int(i) for i in request.qs.get("device_id", [])]
+        filtered = [
+            r
+            for r in results
+            if (r.get("device") or r.get("interface", {}).get("device") or {}).get("id")
+            in device_ids
+        ]
+        return {
+            "count": len(filtered),
+            "next": None,
+            "previous": None,
+            "results": filtered,
+        }
+
+    requests_mock.get(
+        f"http://localhost:8080/api/{application}/{resource}/?limit=0",
+        json=_filter,
+        headers={"Content-type": "application/json"},
+    )
+    return results
+
+
+def _create_config_context_mock(requests_mock: Mocker) -> None:
+    """initialises a mock object that returns the config context of the requested devices"""
+
+    def _config_contexts(request: Any, context: Any) -> Any:
+        results = [
+            {"id": int(i), "config_context": {"ntp": [f"10.0.0.{i}"]}}
+            for i in request.qs["id"]
+        ]
+        return {
+            "count": len(results),
+            "next": None,
+            "previous": None,
+            "results": results,
+        }
+
+    requests_mock.get(
+        "http://localhost:8080/api/dcim/devices/?limit=0",
+        additional_matcher=lambda request: "id" in request.qs,
+        json=_config_contexts,
+        headers={"Content-type": "application/json"},
+    )
+
+
+def _create_paginated_mock(
+    requests_mock: Mocker,
+    version: str,
+    application: str,
+    resource: str,
+    max_page_size: int,
+) -> None:
+    """initialises a mock object that paginates like NetBox, using limit and offset"""
+    with open(f"{BASE_PATH}/mocked/{version}/{resource}.json", "r") as f:
+        results = json.load(f)["results"]
+
+    url = f"http://localhost:8080/api/{application}/{resource}/"
+
+    def _paginate(request: Any, context: Any) -> Any:
+        limit = int(request.qs.get("limit", ["0"])[0])
+        limit = min(limit, max_page_size) if limit else max_page_size
+        offset = int(request.qs.get("offset", ["0"])[0])
+        end = offset + limit
+        return {
+            "count": len(results),
+            "next": (
+                f"{url}?limit={limit}&offset={end}" if end < len(results) else None
+            ),
+            "previous": (
+                f"{url}?limit={limit}&offset={max(offset - limit, 0)}"
+                if offset
+                else None
+            ),
+            "results": results[offset:end],
+        }
+
+    requests_mock.get(url, json=_paginate, headers={"Content-type": "application/json"})
+
+
 def get_inv(
     requests_mock: Mocker,
     plugin: Type[Union[NBInventory, NetBoxInventory2]],
@@ -161,6 +256,536 @@ class TestNetBoxInventory2(BaseTestInventory):
             expected = json.load(f)
         assert expected == inv.dict()
 
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_use_platform_napalm_driver_resolves_referenced_platforms(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "only platforms referenced by devices are requested, and only once per plugin"
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        _create_mock(requests_mock, False, version, "dcim", "platforms")
+        plugin = self.plugin(use_platform_napalm_driver=True)
+
+        plugin.load()
+        inv = plugin.load()
+
+        platform_requests = [
+            r for r in requests_mock.request_history if "platforms" in r.path
+        ]
+        assert len(platform_requests) == 1
+        assert platform_requests[0].qs["slug"] == ["ios", "junos"]
+        assert inv.hosts["1-Core"].platform == "napalm_junos"
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_use_platform_napalm_driver_unknown_platform(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "a platform that can't be resolved results in an empty platform"
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        requests_mock.get(
+            "http://localhost:8080/api/dcim/platforms/?limit=0",
+            json={"count": 0, "next": None, "previous": None, "results": []},
+        )
+
+        inv = self.plugin(use_platform_napalm_driver=True).load()
+
+        assert inv.hosts["1-Core"].platform is None
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_include_interfaces_and_ip_addresses(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "interfaces and IP addresses are requested in batches of device ids"
+        for application, resource in (("dcim", "interfaces"), ("ipam", "ip-addresses")):
+            _create_filtered_mock(requests_mock, version, application, resource)
+        inv = get_inv(
+            requests_mock,
+            self.plugin,
+            False,
+            version,
+            include_interfaces=True,
+            include_ip_addresses=True,
+            batch_size=2,
+        )
+
+        assert [i["name"] for i in inv.hosts["1-Core"]["interfaces"]] == [
+            "ge-0/0/1",
+            "ge-0/0/2",
+        ]
+        assert [i["address"] for i in inv.hosts["1-Core"]["ip_addresses"]] == [
+            "10.0.1.1/32"
+        ]
+        assert inv.hosts["4"]["interfaces"] == []
+        assert inv.hosts["4"]["ip_addresses"] == []
+
+        interface_requests = [
+            r.qs["device_id"]
+            for r in requests_mock.request_history
+            if "interfaces" in r.path
+        ]
+        assert sorted(interface_requests) == [["1", "2"], ["3", "4"]]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_lazy_config_context(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "config context is excluded from the devices request and fetched on first access"
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        _create_config_context_mock(requests_mock)
+        inv = self.plugin(lazy_config_context=True).load()
+
+        assert requests_mock.request_history[0].qs["exclude"] == ["config_context"]
+        assert "config_context" not in inv.hosts["1-Core"].data
+        assert inv.hosts["1-Core"]["config_context"] == {"ntp": ["10.0.0.1"]}
+        assert inv.hosts["1-Core"].data.get("config_context") == {"ntp": ["10.0.0.1"]}
+        assert requests_mock.request_history[-1].qs["id"] == ["1"]
+        assert "config_context" not in inv.hosts["3-Access"].data
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_prefetch_config_context(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        _create_config_context_mock(requests_mock)
+        inv = self.plugin(lazy_config_context=True, batch_size=2).load()
+
+        prefetch_config_context(
+            inv.filter(filter_func=lambda h: h.name != "4").hosts.values()
+        )
+
+        context_requests = [
+            r.qs["id"] for r in requests_mock.request_history if "id" in r.qs
+        ]
+        assert sorted(context_requests) == [["1", "2"], ["3"]]
+        assert inv.hosts["3-Access"].data["config_context"] == {"ntp": ["10.0.0.3"]}
+        assert "config_context" not in inv.hosts["4"].data
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_lazy_config_context_pickle(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "lazily loaded hosts can be pickled, without the inventory plugin"
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        _create_config_context_mock(requests_mock)
+        inv = self.plugin(lazy_config_context=True).load()
+
+        hosts = [
+            pickle.loads(pickle.dumps(inv.hosts[name]))
+            for name in ("1-Core", "2-Distribution")
+        ]
+
+        assert hosts[0].data.fetcher.inventory is None
+        assert "config_context" not in hosts[0].data
+        assert hosts[0].data.fetcher == hosts[1].data.fetcher
+        prefetch_config_context(hosts)
+        assert requests_mock.request_history[-1].qs["id"] == ["1", "2"]
+        assert hosts[0]["config_context"] == {"ntp": ["10.0.0.1"]}
+        assert hosts[0].data == {
+            **inv.hosts["1-Core"].data,
+            "config_context": {"ntp": ["10.0.0.1"]},
+        }
+
+    @pytest.mark.parametrize("version", VERSIONS)
+    def test_inventory_shared_inventory_file(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        shared_inventory_file = str(tmp_path / "inventory.shared")
+        inv = get_inv(
+            requests_mock,
+            self.plugin,
+            False,
+            version,
+            defaults_file=f"{BASE_PATH}/data/defaults.yaml",
+            group_file=f"{BASE_PATH}/data/groups.yaml",
+            shared_inventory_file=shared_inventory_file,
+        )
+
+        shared = NetBoxSharedInventory(shared_inventory_file)
+        assert shared.host_names() == list(inv.hosts)
+        assert shared.load().dict() == inv.dict()
+
+        partial = NetBoxSharedInventory(
+            shared_inventory_file, hosts=["3-Access"]
+        ).load()
+        assert list(partial.hosts) == ["3-Access"]
+        assert partial.hosts["3-Access"].dict() == inv.hosts["3-Access"].dict()
+        assert partial.hosts["3-Access"].username == inv.hosts["3-Access"].username
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_shared_inventory_file_lazy_config_context(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        "hosts of the shared inventory request their config context on first access"
+        shared_inventory_file = tmp_path / "inventory.shared"
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        _create_config_context_mock(requests_mock)
+        self.plugin(
+            lazy_config_context=True, shared_inventory_file=str(shared_inventory_file)
+        ).load()
+
+        assert shared_inventory_file.stat().st_mode & 0o777 == 0o600
+        shared = NetBoxSharedInventory(str(shared_inventory_file)).load()
+        assert "config_context" not in shared.hosts["1-Core"].data
+        assert shared.hosts["1-Core"]["config_context"] == {"ntp": ["10.0.0.1"]}
+        assert requests_mock.request_history[-1].qs["id"] == ["1"]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_indexes(self, requests_mock: Mocker, version: str) -> None:
+        inv = get_inv(requests_mock, self.plugin, False, version, include_vms=True)
+
+        assert list(inv.lookup(site="sunnyvale-ca")) == [
+            "1-Core",
+            "2-Distribution",
+            "4",
+        ]
+        assert list(inv.lookup(site="sunnyvale-ca", platform="junos")) == [
+            "1-Core",
+            "4",
+        ]
+        assert list(inv.lookup(tag=["pano", "firewall"])) == [
+            "ca-panorama-1",
+            "tx-pa100-fw1",
+        ]
+        assert list(inv.lookup(site="unknown")) == []
+
+        selected = inv.select(device_role="rt", device_type="mx480")
+        assert isinstance(selected, IndexedInventory)
+        assert list(selected.hosts) == ["1-Core", "4"]
+        assert selected.groups is inv.groups
+        assert list(selected.lookup(site="sunnyvale-ca")) == ["1-Core", "4"]
+
+        filtered = inv.filter(filter_func=lambda h: h.name != "4")
+        assert list(filtered.select(platform="junos").hosts) == ["1-Core"]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_group_attributes(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        inv = get_inv(
+            requests_mock,
+            self.plugin,
+            False,
+            version,
+            include_vms=True,
+            group_attributes={"tag": "tags", "status": ["status.value"]},
+        )
+
+        assert [g.name for g in inv.hosts["tx-pa100-fw1"].groups] == [
+            "tag__border",
+            "tag__firewall",
+            "status__active",
+        ]
+        assert [g.name for g in inv.hosts["1-Core"].groups] == ["status__1"]
+        assert list(inv.lookup(status="active")) == [
+            "ca-expedition-10",
+            "ca-panorama-1",
+            "tx-pa100-fw1",
+            "tx-scout-1",
+        ]
+
+    @pytest.mark.parametrize("version", VERSIONS)
+    def test_inventory_hosts_share_groups(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        inv = get_inv(requests_mock, self.plugin, False, version)
+
+        core_groups = inv.hosts["1-Core"].groups
+        assert core_groups is not inv.hosts["4"].groups
+        assert all(a is b for a, b in zip(core_groups, inv.hosts["4"].groups))
+        assert list(core_groups) == list(inv.hosts["4"].groups)
+        assert list(core_groups) != list(inv.hosts["3-Access"].groups)
+
+        core_groups.add(Group(name="maintenance"))
+        assert "maintenance" in core_groups
+        assert "maintenance" not in inv.hosts["4"].groups
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_request_timeout(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        get_inv(requests_mock, self.plugin, True, version, request_timeout=5)
+
+        assert [r.timeout for r in requests_mock.request_history] == [5, 5, 5]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_load_timeout_exceeded_raises_exception(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        with pytest.raises(ValueError):
+            get_inv(requests_mock, self.plugin, False, version, load_timeout=1e-9)
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_snapshot_fallback(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        "inventory is built from the last snapshot when NetBox can't be reached"
+        snapshot_file = str(tmp_path / "snapshot.json")
+        kwargs = {"snapshot_file": snapshot_file, "use_platform_napalm_driver": True}
+        expected = get_inv(requests_mock, self.plugin, False, version, **kwargs)
+        assert expected.metadata["stale"] is False
+
+        requests_mock.get(
+            "http://localhost:8080/api/dcim/devices/?limit=0", status_code=503
+        )
+        inv = self.plugin(**kwargs).load()
+
+        assert inv.dict() == expected.dict()
+        assert inv.metadata["stale"] is True
+        assert inv.metadata["loaded_at"] == expected.metadata["loaded_at"]
+        assert inv.metadata["age"] >= 0
+        assert list(inv.lookup(platform="junos")) == ["1-Core", "4"]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_table(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+        table_file = tmp_path / "inventory.parquet"
+        inv = get_inv(
+            requests_mock,
+            self.plugin,
+            True,
+            version,
+            include_vms=True,
+            table_columns={"site": "site.slug", "primary_ip": "primary_ip.address"},
+            table_file=str(table_file),
+        )
+
+        columns = inv.table.to_pydict()
+        assert columns["host"] == list(inv.hosts)
+        assert columns["site"][:4] == ["sunnyvale-ca"] * 2 + ["san-jose-ca"] + [
+            "sunnyvale-ca"
+        ]
+        assert columns["primary_ip"][0] == "10.0.1.1/32"
+        assert pyarrow_parquet.read_table(str(table_file)).equals(inv.table)
+        assert inv.filter(filter_func=lambda h: True).table is None
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_incremental_load(
+        self, requests_mock: Mocker, version: str, monkeypatch: Any
+    ) -> None:
+        "hosts of unchanged devices are reused by the next load"
+        built = []
+        get_host = self.plugin._get_host
+
+        def _get_host(plugin: Any, device: Any, *args: Any) -> Any:
+            built.append(device["id"])
+            return get_host(plugin, device, *args)
+
+        monkeypatch.setattr(self.plugin, "_get_host", _get_host)
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        plugin = self.plugin(incremental_load=True)
+        previous = plugin.load()
+        assert previous.metadata["diff"] == {
+            "added": list(previous.hosts),
+            "changed": [],
+            "removed": [],
+        }
+        assert len(built) == 4
+
+        built.clear()
+        inv = plugin.load()
+        assert inv.metadata["diff"] == {"added": [], "changed": [], "removed": []}
+        assert all(inv.hosts[n] is previous.hosts[n] for n in previous.hosts)
+        assert built == []
+
+        with open(f"{BASE_PATH}/mocked/{version}/devices.json", "r") as f:
+            devices = json.load(f)
+        devices["results"][0]["serial"] = "changed"
+        devices["results"][0]["last_updated"] = "2021-01-01T00:00:00.000000Z"
+        devices["results"][1]["name"] = "5-Added"
+        # not detected, last_updated didn't change
+        devices["results"][2]["serial"] = "changed"
+        requests_mock.get(
+            "http://localhost:8080/api/dcim/devices/?limit=0",
+            json=devices,
+            headers={"Content-type": "application/json"},
+        )
+
+        inv = plugin.load()
+        assert inv.metadata["diff"] == {
+            "added": ["5-Added"],
+            "changed": ["1-Core"],
+            "removed": ["2-Distribution"],
+        }
+        assert inv.hosts["1-Core"] is not previous.hosts["1-Core"]
+        assert inv.hosts["1-Core"].data["serial"] == "changed"
+        assert inv.hosts["3-Access"] is previous.hosts["3-Access"]
+        assert inv.hosts["3-Access"].data["serial"] != "changed"
+        assert sorted(built) == [1, 2]
+        assert all(inv.groups[g.name] is g for g in inv.hosts["3-Access"].groups)
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_incremental_load_related_objects(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "interfaces without last_updated timestamp are compared by their content"
+        interfaces = _create_filtered_mock(requests_mock, version, "dcim", "interfaces")
+        _create_filtered_mock(requests_mock, version, "ipam", "ip-addresses")
+        _create_mock(requests_mock, False, version, "dcim", "devices")
+        plugin = self.plugin(
+            incremental_load=True, include_interfaces=True, include_ip_addresses=True
+        )
+        first = plugin.load()
+
+        inv = plugin.load()
+        assert inv.metadata["diff"] == {"added": [], "changed": [], "removed": []}
+        assert all(inv.hosts[name] is host for name, host in first.hosts.items())
+
+        interfaces[0]["description"] = "changed"
+        inv = plugin.load()
+        changed = interfaces[0]["device"]["name"]
+        assert inv.metadata["diff"]["changed"] == [changed]
+        assert inv.hosts[changed] is not first.hosts[changed]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_auto_plan(
+        self, requests_mock: Mocker, version: str, monkeypatch: Any
+    ) -> None:
+        expected = get_inv(requests_mock, self.plugin, False, version, include_vms=True)
+        _create_paginated_mock(requests_mock, version, "dcim", "devices", 3)
+        _create_paginated_mock(
+            requests_mock, version, "virtualization", "virtual-machines", 3
+        )
+        for application, resource in (
+            ("dcim", "interfaces"),
+            ("virtualization", "interfaces"),
+            ("ipam", "ip-addresses"),
+        ):
+            _create_filtered_mock(requests_mock, version, application, resource)
+        requests_mock.reset_mock()
+        choices = []
+
+        def _choose_pages(*args: Any) -> Any:
+            choices.append(args[:2])
+            return 2, 2
+
+        monkeypatch.setattr(self.plugin, "PLAN_SAMPLE_SIZE", 1)
+        monkeypatch.setattr(netbox, "_choose_pages", _choose_pages)
+        inv = self.plugin(
+            auto_plan=True,
+            include_vms=True,
+            include_interfaces=True,
+            include_ip_addresses=True,
+        ).load()
+
+        assert list(inv.hosts) == list(expected.hosts)
+        for name, host in expected.hosts.items():
+            data = dict(inv.hosts[name].data)
+            del data["interfaces"], data["ip_addresses"]
+            assert data == host.data
+        plan = inv.metadata["plan"]
+        assert plan.source == "netbox"
+        assert choices == [(4, 3), (4, 3)]
+        assert plan.endpoints["dcim/devices"].objects == 4
+        assert plan.endpoints["dcim/devices"].page_limit == 3
+        assert plan.endpoints["dcim/devices"].pages == 2
+        assert plan.endpoints["virtualization/virtual-machines"].workers == 2
+        assert plan.probe_requests == 4
+        assert 1 <= plan.batch_size <= 100
+        assert requests_mock.call_count == plan.probe_requests + plan.expected_requests
+        page_requests = [
+            r.qs for r in requests_mock.request_history if "offset" in r.qs
+        ][-4:]
+        assert (
+            page_requests
+            == [
+                {"limit": ["2"], "offset": ["0"]},
+                {"limit": ["2"], "offset": ["2"]},
+            ]
+            * 2
+        )
+        batches = [
+            r.qs["device_id"]
+            for r in requests_mock.request_history
+            if "device_id" in r.qs
+        ]
+        assert all(len(b) <= plan.batch_size for b in batches)
+        assert "dcim/devices: 4 objects, page limit 3" in plan.explain()
+        assert "  2 pages of 2 objects using 2 workers" in plan.explain()
+        assert f"expected requests: {plan.expected_requests}" in plan.explain()
+
+    def test_choose_pages(self) -> None:
+        # request overhead dominates, fewer workers are almost as fast
+        assert netbox._choose_pages(1500, 1000, 0.1, 0.0001, 4) == (500, 3)
+        # transfer time dominates, pages are spread over all workers
+        assert netbox._choose_pages(4000, 1000, 0.01, 0.01, 4) == (1000, 4)
+        assert netbox._choose_pages(1500, 1000, 0.01, 0.01, 4) == (375, 4)
+        # a single page
+        assert netbox._choose_pages(500, 1000, 0.1, 0, 4) == (500, 1)
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_auto_plan_snapshot_fallback(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        kwargs = {"auto_plan": True, "snapshot_file": str(tmp_path / "snapshot.json")}
+        _create_paginated_mock(requests_mock, version, "dcim", "devices", 1000)
+        expected = self.plugin(**kwargs).load()
+        assert expected.metadata["plan"].endpoints["dcim/devices"].pages == 1
+
+        requests_mock.get("http://localhost:8080/api/dcim/devices/", status_code=503)
+        plugin = self.plugin(**kwargs)
+        assert "source: snapshot" in plugin.explain()
+
+        inv = plugin.load()
+        assert inv.dict() == expected.dict()
+        assert inv.metadata["stale"] is True
+        assert inv.metadata["plan"].source == "snapshot"
+        assert inv.metadata["plan"].expected_requests == 0
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_table_mixed_types(
+        self, requests_mock: Mocker, version: str
+    ) -> None:
+        "columns with values of different types are converted to strings"
+        pytest.importorskip("pyarrow")
+        with open(f"{BASE_PATH}/mocked/{version}/devices.json", "r") as f:
+            devices = json.load(f)
+        devices["results"][0]["custom_fields"] = {"user_defined": "abc"}
+        requests_mock.get(
+            "http://localhost:8080/api/dcim/devices/?limit=0",
+            json=devices,
+            headers={"Content-type": "application/json"},
+        )
+
+        inv = self.plugin(
+            table_columns={"cf": "custom_fields.user_defined", "id": "id"}
+        ).load()
+
+        columns = inv.table.to_pydict()
+        assert columns["cf"] == ["abc", None, "1", None]
+        assert columns["id"] == [1, 2, 3, 4]
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_table_related_objects(
+        self, tmp_path: Path, requests_mock: Mocker, version: str
+    ) -> None:
+        "columns can use attached objects, also when loading from the snapshot"
+        pytest.importorskip("pyarrow")
+        _create_filtered_mock(requests_mock, version, "dcim", "interfaces")
+        kwargs = {
+            "include_interfaces": True,
+            "snapshot_file": str(tmp_path / "snapshot.json"),
+            "table_columns": {"interfaces": "interfaces"},
+        }
+        inv = get_inv(requests_mock, self.plugin, False, version, **kwargs)
+
+        columns = inv.table.to_pydict()
+        assert [len(i) for i in columns["interfaces"]] == [
+            len(inv.hosts[name]["interfaces"]) for name in columns["host"]
+        ]
+        assert len(columns["interfaces"][0]) == 2
+
+        requests_mock.get(
+            "http://localhost:8080/api/dcim/devices/?limit=0", status_code=503
+        )
+        stale = self.plugin(**kwargs).load()
+        assert stale.metadata["stale"] is True
+        assert stale.table.equals(inv.table)
+
+    def test_inventory_table_file_without_columns_raises_exception(self) -> None:
+        with pytest.raises(ValueError):
+            self.plugin(table_file="inventory.parquet")
+
     @pytest.mark.parametrize("version", VERSIONS)
     def test_inventory_with_defaults_file(
         self, requests_mock: Mocker, version: str
@@ -292,6 +917,79 @@ class TestNetBoxInventory2(BaseTestInventory):
             == inv.hosts["2-Distribution"]["domain"]
         )
 
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_group_file_is_cached(
+        self, tmp_path: Path, requests_mock: Mocker, version: str, monkeypatch: Any
+    ) -> None:
+        "group file is only parsed again when it changes"
+        group_file = tmp_path / "groups.yaml"
+        group_file.write_text("platform__junos:\n  username: juniper\n")
+        parsed = []
+        monkeypatch.setattr(netbox, "_yaml_file_cache", {})
+        monkeypatch.setattr(
+            netbox.ruamel.yaml.YAML,
+            "load",
+            lambda self, f: parsed.append(f.name) or {"platform__junos": {}},
+        )
+
+        for _ in range(2):
+            inv = get_inv(
+                requests_mock, self.plugin, False, version, group_file=str(group_file)
+            )
+            inv.groups["platform__junos"].data["modified"] = True
+        assert len(parsed) == 1
+        assert inv.groups["platform__junos"].data == {"modified": True}
+
+        group_file.write_text("platform__junos:\n  username: admin\n")
+        get_inv(requests_mock, self.plugin, False, version, group_file=str(group_file))
+        assert len(parsed) == 2
+
+    @pytest.mark.parametrize("version", ["2.8.9"])
+    def test_inventory_group_file_cache_dir(
+        self, tmp_path: Path, requests_mock: Mocker, version: str, monkeypatch: Any
+    ) -> None:
+        "parsed group file is shared through the cache directory"
+        group_file = f"{BASE_PATH}/data/groups.yaml"
+        cache_dir = tmp_path / "cache"
+        monkeypatch.setattr(netbox, "_yaml_file_cache", {})
+        expected = get_inv(
+            requests_mock,
+            self.plugin,
+            False,
+            version,
+            group_file=group_file,
+            file_cache_dir=str(cache_dir),
+        ).dict()
+        assert len(list(cache_dir.glob("*.pickle"))) == 1
+
+        monkeypatch.setattr(netbox, "_yaml_file_cache", {})
+        monkeypatch.setattr(netbox.ruamel.yaml.YAML, "load", None)
+        inv = get_inv(
+            requests_mock,
+            self.plugin,
+            False,
+            version,
+            group_file=group_file,
+            file_cache_dir=str(cache_dir),
+        )
+        assert inv.dict() == expected
+
+    def test_load_yaml_file_cache_dir_replaces_stale_entries(
+        self, tmp_path: Path, monkeypatch: Any
+    ) -> None:
+        group_file = tmp_path / "groups.yaml"
+        cache_dir = tmp_path / "cache"
+        monkeypatch.setattr(netbox, "_yaml_file_cache", {})
+
+        for i in range(3):
+            group_file.write_text(f"group{i}: {{}}\n" + "#" * i)
+            assert len(netbox._load_yaml_file(group_file, cache_dir)) == 1
+            assert len(list(cache_dir.iterdir())) == 1
+
+        monkeypatch.setattr(netbox, "_yaml_file_cache", {})
+        monkeypatch.setattr(netbox.ruamel.yaml.YAML, "load", None)
+        assert netbox._load_yaml_file(group_file, cache_dir) == {"group2": {}}
+
     @pytest.mark.parametrize("version", VERSIONS)
     def test_inventory_with_empty_defaults_file(
         self, requests_mock: Mocker, version: str